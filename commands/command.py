@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
-from typing import Optional
+from typing import Generator, Optional
+from collections import deque
 import time
 
 from devices.device import Device
@@ -14,6 +15,16 @@ class Command(ABC):
     """The Command abstract base class which acts as an interface for other objects that use commands."""
 
     receiver_cls = None # or Device?
+    description = __doc__ # the command's docstring, set on every subclass in __init_subclass__
+    _cls_name = 'Command' # the class name used when building names, set on every subclass in __init_subclass__
+    _name_cache = None # class level default so commands loaded from yaml (which skips __init__) still have it
+
+    def __init_subclass__(cls, **kwargs):
+        # docstrings and class names belong to the class and never change, so they are stored as plain class attributes
+        # instead of being looked up through __doc__ and type(self) on every access
+        super().__init_subclass__(**kwargs)
+        cls.description = cls.__doc__
+        cls._cls_name = cls.__name__
 
     @abstractmethod
     def __init__(self, receiver: Device, delay: float = 0.0):
@@ -23,6 +34,9 @@ class Command(ABC):
         self._params = {}
         self._params['receiver_name'] = receiver.name
         self._params['delay'] = delay
+        # params are not meant to change after construction, so the name is built once on first access
+        # if a mutation path is ever added it must reset this to None
+        self._name_cache = None
         # self._was_successful = None
         # self._result_message = None  
 
@@ -49,28 +63,28 @@ class Command(ABC):
         str
             Returns the command's class name followed by its parameters.
         """
-        self._name = type(self).__name__
+        if self._name_cache is None:
+            self._name_cache = self._build_name()
+        return self._name_cache
+
+    def _build_name(self) -> str:
+        name = self._cls_name
         for key, value in self._params.items():
             if not key == 'delay':
-                self._name += " " + key + "=" + str(value)
+                name += " " + key + "=" + str(value)
         # I want delay to always be last when displayed and only if its not zero
         if isinstance(self._params['delay'], str):
-            self._name += " " + 'delay=' + str(self._params['delay'])
+            name += " " + 'delay=' + str(self._params['delay'])
         else:
             if self._params['delay'] > 0.0:
-                self._name += " " + 'delay=' + str(self._params['delay'])
-        return self._name
-
-    @property
-    def description(self) -> str:
-        """The command's description getter.
+                name += " " + 'delay=' + str(self._params['delay'])
+        return name
 
-        Returns
-        -------
-        str
-            Returns the command's docstring
-        """
-        return self.__doc__
+    def __getstate__(self):
+        # cached values are rebuilt on demand so they are not saved with the recipe
+        state = self.__dict__.copy()
+        state.pop('_name_cache', None)
+        return state
 
     # params and receiver getter?
 
@@ -107,6 +121,9 @@ class Command(ABC):
 class CommandResult():
     """Object which stores whether a command's execution was successful and other relevant information"""
 
+    # a new result is created on every execution and it only ever holds these two attributes
+    __slots__ = ('_was_successful', '_message')
+
     def __init__(self, was_successful: Optional[bool] = None, message: Optional[str] = None):
         # I considered whether to have a reset/update function instead and have init call it, this function could be used outside to reset/update the result attributes
         # The alternative is to just use the contructor to create a new reset object. I decided just using the constructor is better.
@@ -116,6 +133,18 @@ class CommandResult():
         
         self._was_successful = was_successful
         self._message = message
+
+    # Without these a slotted object is saved to yaml as !!python/object/new with a (None, slots) state tuple,
+    # so they keep the plain mapping form that recipes used before __slots__ (also used by copy.deepcopy)
+    def __getstate__(self):
+        return {'_was_successful': self._was_successful, '_message': self._message}
+
+    def __setstate__(self, state):
+        # results saved while only __slots__ was defined have the (None, slots) tuple state
+        if isinstance(state, tuple):
+            state = state[1]
+        self._was_successful = state.get('_was_successful')
+        self._message = state.get('_message')
     
     @property
     def was_successful(self) -> Optional[bool]:
@@ -140,6 +169,11 @@ class CommandResult():
         return self._message        
     
 
+# Class level default result for commands loaded from yaml, which skips __init__ (e.g. recipes saved before _result existed)
+# Defined here since CommandResult comes after Command. A CommandResult has no setters, so sharing one empty instance is safe
+Command._result = CommandResult()
+
+
 # A composite command contains a command list but it behaves like a regular command to any other object using it.
 # This means a composite command can contain a composite command and it can have many levels arbitrarily deep
 # This also means it can potentially be recursive causing an infinite loop
@@ -150,12 +184,25 @@ class CompositeCommand(Command):
     """A composite command which contains multiple commands but can act like a single command that executes all contained commands sequentially."""
 
     # receiver_cls = None
+
+    # Bumped whenever any composite's command list changes. A cached name is only reused while this matches the version
+    # it was built at, which also covers a nested composite being changed after it was added to this one
+    _structure_version = 0
+    _name_cache_version = -1
     
-    def __init__(self, delay: float = 0.0):
+    def __init__(self, delay: float = 0.0, container: str = 'list'):
         # super().__init__(**kwargs)
         # self._name = "CompositeCommand"
         # self._receiver_name = "N/A temp"
-        self._command_list = []
+        # A list is best for the usual append-only building of a composite. 
+        # A deque can be used instead if commands are often inserted or removed at the front, which is O(1) for a deque but O(N) for a list.
+        # Either is only ever iterated during execution, so this does not change how the composite executes.
+        if container == 'list':
+            self._command_list = []
+        elif container == 'deque':
+            self._command_list = deque()
+        else:
+            raise ValueError("container must be 'list' or 'deque', not " + repr(container) + ".")
         # self._receiver = None
         self._params = {}
         # self._params['receiver_name'] = 'None'
@@ -173,21 +220,37 @@ class CompositeCommand(Command):
         str
             Indicates it is a composite command followed by the names and params of each command it contains.
         """
-        self._name = type(self).__name__ + " (CompositeCommand):"
-        for command in self._command_list:
-            self._name += " \n\t" + command.name + ";"
-        return self._name
+        if self._name_cache is None or self._name_cache_version != CompositeCommand._structure_version:
+            self._name_cache = self._build_name()
+            self._name_cache_version = CompositeCommand._structure_version
+        return self._name_cache
 
-    @property
-    def description(self) -> str:
-        """The composite command's description getter.
+    def _build_name(self) -> str:
+        return self._cls_name + " (CompositeCommand):" + "".join([" \n\t" + command.name + ";" for command in self.iter_commands()])
 
-        Returns
+    def __getstate__(self):
+        state = super().__getstate__()
+        state.pop('_name_cache_version', None)
+        return state
+
+    def iter_commands(self, recurse: bool = False) -> Generator[Command, None, None]:
+        """Yield each command in the command list without copying it.
+
+        Parameters
+        ----------
+        recurse : bool, optional
+            Whether to yield the commands inside nested composite commands instead of the composite commands themselves, by default False
+
+        Yields
         -------
-        str
-            Returns the composite command's docstring
+        Generator[Command, None, None]
+            Generator that yields the next command in the command list
         """
-        return self.__doc__
+        for command in self._command_list:
+            if recurse and isinstance(command, CompositeCommand):
+                yield from command.iter_commands(recurse=True)
+            else:
+                yield command
 
     def add_command(self, command: Command, index: Optional[int] = None):
         """Add a command to the command list.
@@ -203,6 +266,7 @@ class CompositeCommand(Command):
             self._command_list.append(command)
         else: 
             self._command_list.insert(index, command)
+        CompositeCommand._structure_version += 1
 
     def remove_command(self, index: Optional[int] = None):
         """Remove a command from the command list.
@@ -213,14 +277,44 @@ class CompositeCommand(Command):
             The index of the command to remove, if None then removes the last command, by default None
         """
         if index is None:
-            index = -1
-        del self._command_list[index]
+            self._command_list.pop()
+        else:
+            if not -len(self._command_list) <= index < len(self._command_list):
+                raise IndexError("Cannot remove command at index " + str(index) + " from a command list of length " + str(len(self._command_list)) + ".")
+            # del instead of pop(index) since deque.pop does not accept an index
+            del self._command_list[index]
+        CompositeCommand._structure_version += 1
 
     def execute(self) -> None:
         """Executes each command in the command list sequentially and returns early if a command's execution was not successful."""
         # LOGGING? 
-        for command in self._command_list:
-            
+        # Nested composites are walked with an explicit stack instead of calling their execute() recursively,
+        # so a whole tree of composites runs in this one loop. Composites that override execute() are still called normally.
+        # Each composite on the stack ends up holding the result of the last command it executed, same as executing recursively,
+        # and a nested composite that did not succeed (including an empty one whose result is still None) stops its parents too.
+        # The stack has no depth limit, so a composite that contains itself is caught here instead of looping forever
+        stack = [(self, iter(self._command_list))]
+        active_ids = {id(self)}
+        result = self._result
+        while stack:
+            composite, commands = stack[-1]
+            command = next(commands, None)
+            if command is None:
+                composite._result = result
+                stack.pop()
+                active_ids.discard(id(composite))
+                if stack and not result._was_successful:
+                    for composite, _ in stack:
+                        composite._result = result
+                    return
+                continue
+
+            if id(command) in active_ids:
+                result = CommandResult(False, "Composite command " + command._cls_name + " contains itself. Stopped execution to avoid an infinite loop.")
+                for composite, _ in stack:
+                    composite._result = result
+                return
+
             delay = command._params['delay']
             if isinstance(delay, float) or isinstance(delay, int):
                 if delay > 0.0:
@@ -228,11 +322,20 @@ class CompositeCommand(Command):
             elif delay == "PAUSE" or delay == "P":
                 userinput = input()
 
+            if isinstance(command, CompositeCommand) and type(command).execute is CompositeCommand.execute:
+                stack.append((command, iter(command._command_list)))
+                active_ids.add(id(command))
+                result = command._result
+                continue
+
             command.execute()
             # self._result.was_successful = command.was_successful
             # self._result._message = command.result_message
-            self._result = command.result
-            if not command.was_successful:
+            # read the attributes behind the result/was_successful properties directly, both classes are defined in this module
+            result = command._result
+            if not result._was_successful:
+                for composite, _ in stack:
+                    composite._result = result
                 return 
 
         # store the success of the last command 
@@ -1,7 +1,12 @@
 from abc import ABC, abstractmethod
-from typing import Optional, Tuple
+from typing import Callable, Optional, Tuple
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
 import time
 import functools
+import threading
+import queue
+import weakref
 try:
     import serial
 except ImportError:
@@ -30,7 +35,7 @@ def check_initialized(func=None, *, message=None):
 # Note that in some cases the initialize function starts by calling another function that already checks serial
 def check_serial(func=None, *, message=None):
     if func is None:
-        return functools.partial(check_initialized, message=message)
+        return functools.partial(check_serial, message=message)
 
     @functools.wraps(func)
     def wrapper(self, *args, **kwargs):
@@ -43,6 +48,47 @@ def check_serial(func=None, *, message=None):
     return wrapper
 
 
+# Combined check_serial + check_initialized in a single wrapper, so methods that need both
+# only pay for one extra call frame and the open/initialized checks short circuit on the common (ready) path
+# The failure messages are the same as the individual decorators, serial is checked first
+def check_serial_initialized(func=None, *, message=None):
+    if func is None:
+        return functools.partial(check_serial_initialized, message=message)
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        is_open = self.ser.is_open
+        if is_open and self._is_initialized:
+            return func(self, *args, **kwargs)
+        if message is not None:
+            return (False, message)
+        if not is_open:
+            return (False, "Serial port " + self._port + " is not open.")
+        return (False, type(self).__name__ + " object is not initialized.")
+    return wrapper
+
+
+# For SerialDevice methods that use the serial port, runs the method on the device's worker thread which owns the port
+# Calls from any other thread are queued and block until done so the method behaves exactly as before, 
+# use SerialDevice.submit instead to get a Future back without blocking
+# Calls from the worker itself (e.g. initialize calling set_settemp) run directly, otherwise they would wait on themselves
+# The wait polls with a short timeout because a lock wait without one cannot be interrupted by Ctrl+C on Windows (before Python 3.14)
+def run_on_worker(func):
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        if threading.current_thread() is self._worker_thread:
+            return func(self, *args, **kwargs)
+        future = self.submit(func, self, *args, **kwargs)
+        while True:
+            try:
+                return future.result(timeout=SerialDevice.worker_poll_interval)
+            except FutureTimeoutError:
+                # on Python 3.11+ this is the builtin TimeoutError, so it could also have been raised by func itself
+                if future.done():
+                    raise
+    return wrapper
+
+
 # *args, **kwargs https://stackoverflow.com/questions/6034662/python-method-overriding-does-signature-matter
 # Consider using *args and **kwargs, although you lose the ability of the IDE to hint at the args needed in a signature
 
@@ -98,6 +144,14 @@ class Device(ABC):
 class SerialDevice(Device):
     """A Device that uses serial communication."""
 
+    # created on first use, one worker thread per device so queued serial I/O never interleaves
+    worker_poll_interval = 0.5 # seconds between checks for Ctrl+C while a synchronous call waits on the worker
+    _worker_thread = None
+    _worker_queue = None
+    _worker_lock = threading.Lock()
+    # attributes that only make sense for the current session and are not saved with recipes or copied
+    _transient_attrs = ('_worker_thread', '_worker_queue')
+
     def __init__(self, name: str, port: str, baudrate: int, timeout: Optional[float] = 1.0):
         super().__init__(name)
         self._port = port
@@ -129,6 +183,67 @@ class SerialDevice(Device):
     def timeout(self, timeout: Optional[float]):
         self._timeout = timeout
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for attr in self._transient_attrs:
+            state.pop(attr, None)
+        return state
+
+    def submit(self, func: Callable, *args, **kwargs) -> Future:
+        """Queue a call on the device's worker thread and return immediately instead of waiting for the serial I/O.
+
+        Parameters
+        ----------
+        func : Callable
+            The function to call, usually one of the device's methods e.g. device.submit(device.temperature)
+        *args, **kwargs
+            Passed on to func
+
+        Returns
+        -------
+        Future
+            Holds whatever func returns (usually a Tuple[bool, ...]) once the worker has run it
+        """
+        with SerialDevice._worker_lock:
+            if self._worker_thread is None or not self._worker_thread.is_alive():
+                self._worker_queue = queue.SimpleQueue()
+                self._worker_thread = threading.Thread(
+                    target=SerialDevice._worker_loop, 
+                    args=(self._worker_queue,), 
+                    name=self._name + " serial worker", 
+                    daemon=True)
+                self._worker_thread.start()
+                # stop the worker once the device is garbage collected, e.g. a deepcopy made for manual execution
+                weakref.finalize(self, self._worker_queue.put, None)
+            # queued while still holding the lock so stop_worker cannot clear the queue or put its sentinel ahead of this job
+            future = Future()
+            self._worker_queue.put((future, func, args, kwargs))
+        return future
+
+    def stop_worker(self):
+        """Stop the device's worker thread after it finishes any calls already queued. A new worker is started on the next call."""
+        with SerialDevice._worker_lock:
+            if self._worker_queue is not None:
+                self._worker_queue.put(None)
+            self._worker_thread = None
+            self._worker_queue = None
+
+    @staticmethod
+    def _worker_loop(work_queue: queue.SimpleQueue):
+        # Static and only given the queue, and each job is deleted once it is done, so that while waiting for the next job
+        # the thread holds no reference to the device. None is the sentinel to exit (see stop_worker and the finalizer in submit)
+        while True:
+            job = work_queue.get()
+            if job is None:
+                return
+            future, func, args, kwargs = job
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(func(*args, **kwargs))
+                except BaseException as inst:
+                    future.set_exception(inst)
+            del job, future, func, args, kwargs
+
     def start_serial(self, delay: float = 5.0) -> Tuple[bool, str]:
         """Set the serial port parameters and try to open the serial port
 
@@ -239,37 +354,40 @@ class ArduinoSerialDevice(SerialDevice):
         return (True, "Successfully received the control char or str " + control_char + " with message: " + response_comment + ".")
 
     def get_response(self, response_timeout: float = 1.0) -> Tuple[bool, str]:
+        # readline is looked up once since it is called on every retry
+        readline = self.ser.readline
+        timeout = self._timeout
         retry_count = 0
-        partial_retries = ArduinoSerialDevice.partial_timeout // self._timeout
-        response_retries = response_timeout // self._timeout
+        partial_retries = ArduinoSerialDevice.partial_timeout // timeout
+        response_retries = response_timeout // timeout
 
         if response_retries < 1:
             response_retries = 1
         
         # using integer retries of period self.timeout, this is because changing ser.timeout directly causes problems
+        # the response is kept as bytes while reading and only decoded once at the end
         response_result = b''
-        while response_result.decode('ascii') == "" and retry_count < response_retries:
-            response_result = self.ser.readline()
+        while response_result == b'' and retry_count < response_retries:
+            response_result = readline()
             retry_count += 1
 
         # https://stackoverflow.com/questions/61166544/readline-in-pyserial-sometimes-captures-incomplete-values-being-streamed-from
         # in case readline times out in the middle of a message before \n
         retry_count = 0
-        while response_result.decode('ascii') != "" and "\\n" not in str(response_result) and retry_count < partial_retries:
-            temp_result = self.ser.readline()
+        while response_result != b'' and b'\n' not in response_result and retry_count < partial_retries:
+            temp_result = readline()
             retry_count += 1
             
-            # "not not" is correct, means not empty, != ""
-            if not not temp_result.decode('ascii'):
-                response_result = (response_result.decode('ascii') + temp_result.decode('ascii')).encode('ascii')
+            if temp_result != b'':
+                response_result += temp_result
         
-        if retry_count == partial_retries and "\\n" not in str(response_result):
-            return (False, "Timed out. Partial message received for potential control char or str " + control_char + ".")
+        if retry_count == partial_retries and b'\n' not in response_result:
+            return (False, "Timed out. Partial message received: " + response_result.decode('ascii') + ".")
 
         response_result = response_result.strip().decode('ascii')
 
         if response_result == "":
-            return (False, "Timed out. Did not receive any response for control char or str " + control_char + ".")
+            return (False, "Timed out. Did not receive any response.")
 
         return (True, response_result)
     
@@ -1,10 +1,52 @@
-from typing import Optional, Tuple, Union
+from typing import Callable, Optional, Tuple, Union
+import re
+import time
 import serial
 
-from .device import ArduinoSerialDevice, check_initialized, check_serial
+from .device import ArduinoSerialDevice, check_serial, check_serial_initialized, run_on_worker
+
+# payloads are bytes from the start, fixed ones are literals and setpoints are formatted straight into bytes
+# so no command is ever built as a str and then encoded
+_CMD_PIDON = b">pidon\n"
+_CMD_PIDOFF = b">pidoff\n"
+_CMD_PR_PID = b">pr pid\n"
+_CMD_PR_T = b">pr T\n"
+_PREFIX_TS = b">set Ts "
+_PREFIX_T = b">set T "
+
+# Responses look like "... with message: PID=ON." (check_response appends the trailing period)
+# so only the value right after the = sign is captured
+_PID_STATE_RE = re.compile(r"=\s*([A-Za-z]+)")
+
+
+# Temperature responses look like "... with message: T=26.43." and are polled often, so instead of a regex 
+# the text after the last = sign is sliced out, the period check_response appends is stripped, and float() parses the rest
+# Returns None if there is no = sign or no number after it
+def _parse_temperature(comment: str) -> Optional[float]:
+    _, equal_sign, value = comment.rpartition('=')
+    if not equal_sign:
+        return None
+    try:
+        return float(value.rstrip('.'))
+    except ValueError:
+        return None
+
+
+# formatted to 6 significant digits so float error like 26.000000000001 does not add extra bytes to the write
+# and whole numbers stay short (26.0 is sent as 26)
+def _setpoint_payload(prefix: bytes, temp: float) -> bytes:
+    return prefix + b"%.6g\n" % temp
 
 
 class HeatingStage(ArduinoSerialDevice):
+
+    # The PID state rarely changes, so is_pid_on reuses a reading for this many seconds instead of querying the device again
+    # pid_on/pid_off update the cached state directly so it is never stale after changing it from here
+    pid_state_ttl = 0.1
+    _pid_state_cache = None # (time.monotonic() of the reading, is PID on)
+    # monotonic timestamps are meaningless in another session so the cache is not saved with recipes
+    _transient_attrs = ArduinoSerialDevice._transient_attrs + ('_pid_state_cache',)
+
     def __init__(
             self, 
             name: str,  
@@ -16,130 +58,168 @@ class HeatingStage(ArduinoSerialDevice):
         super().__init__(name, port, baudrate, timeout)
         self._heating_timeout = heating_timeout
 
+    # opened on the worker too so the port is never (re)opened while a queued call is using it
+    @run_on_worker
+    def start_serial(self, delay: float = 5.0) -> Tuple[bool, str]:
+        return super().start_serial(delay)
+
     # no need to check serial as set_settemp and pid_on has these checks already
+    @run_on_worker
     def initialize(self) -> Tuple[bool, str]:
         self._is_initialized = True
-        was_set, comment = self.set_settemp(26.0)
+        was_initialized, comment = self._run_steps(
+            (self.set_settemp, (26.0,)), 
+            (self.pid_on, ()))
 
-        if not was_set:
-            self._is_initialized = False
-            return (was_set, comment)
-
-        was_turned_on, comment = self.pid_on()
-
-        if not was_turned_on:
-            self._is_initialized = False
-            return (was_turned_on, comment)
+        if not was_initialized:
+            return (was_initialized, comment)
 
         return (True, "Heating stage successfully initialized by setting to 26 C and turning PID ON.")
 
+    @run_on_worker
     def deinitialize(self, reset_init_flag: bool = True) -> Tuple[bool, str]:
         self._is_initialized = True
-        was_set, comment = self.set_settemp(24.0)
-
-        if not was_set:
-            self._is_initialized = False
-            return (was_set, comment)
+        was_deinitialized, comment = self._run_steps(
+            (self.set_settemp, (24.0,)), 
+            (self.pid_off, ()))
 
-        was_turned_off, comment = self.pid_off()
-
-        if not was_turned_off:
-            self._is_initialized = False
-            return (was_turned_off, comment)
+        if not was_deinitialized:
+            return (was_deinitialized, comment)
 
         if reset_init_flag:
             self._is_initialized = False
 
         return (True, "Heating stage successfully deinitialized by setting to 24 C and turning PID OFF.")
 
-    @check_serial
-    @check_initialized
+    def _run_steps(self, *steps: Tuple[Callable[..., Tuple[bool, str]], tuple]) -> Tuple[bool, str]:
+        # Calls each (method, args) in order and stops at the first one that fails, returning its result
+        # The device is flagged as not initialized on failure since it is left partway through (de)initialization
+        for step, args in steps:
+            was_successful, comment = step(*args)
+            if not was_successful:
+                self._is_initialized = False
+                return (was_successful, comment)
+        return (True, "")
+
+    @run_on_worker
+    @check_serial_initialized
     def set_settemp(self, temp: float) -> Tuple[bool, str]:
         # if not self.ser.is_open:
         #     return (False, "Serial port " + self._port + " is not open. ")
         # elif not self._is_initialized:
         #     return (False, "Heating stage is not initialized.")
         # else:
-        command = ">set Ts " + str(temp) +"\n"
-        self.ser.write(command.encode('ascii'))
+        self.ser.write(_setpoint_payload(_PREFIX_TS, temp))
         return self.check_ack_succ()
 
-    @check_serial
-    @check_initialized
+    @run_on_worker
+    @check_serial_initialized
     def set_temp(self, temp: float) -> Tuple[bool, str]:
         # if not self.ser.is_open:
         #     return (False, "Serial port " + self._port + " is not open. ")
         # elif not self._is_initialized:
         #     return (False, "Heating stage is not initialized.")
         # else:
-        command = ">set T " + str(temp) +"\n"
-        self.ser.write(command.encode('ascii'))
+        self.ser.write(_setpoint_payload(_PREFIX_T, temp))
         return self.check_ack_succ(ack_timeout=1.0, succ_timeout=self._heating_timeout)
 
-    @check_serial
-    @check_initialized
+    @run_on_worker
+    @check_serial_initialized
     def pid_on(self) -> Tuple[bool, str]:
         # if not self.ser.is_open:
         #     return (False, "Serial port " + self._port + " is not open. ")
         # elif not self._is_initialized:
         #     return (False, "Heating stage is not initialized.")
         # else:
-        command = ">pidon\n"
-        self.ser.write(command.encode('ascii'))
-        return self.check_ack_succ()
+        self.ser.write(_CMD_PIDON)
+        was_turned_on, comment = self.check_ack_succ()
+        # if it failed the PID state is unknown so the next is_pid_on asks the device
+        self._pid_state_cache = (time.monotonic(), True) if was_turned_on else None
+        return (was_turned_on, comment)
 
+    @run_on_worker
     @check_serial
     def pid_off(self) -> Tuple[bool, str]:
         # if not self.ser.is_open:
         #     return (False, "Serial port " + self._port + " is not open. ")
         # else:
-        command = ">pidoff\n"
-        self.ser.write(command.encode('ascii'))
-        return self.check_ack_succ()
+        self.ser.write(_CMD_PIDOFF)
+        was_turned_off, comment = self.check_ack_succ()
+        self._pid_state_cache = (time.monotonic(), False) if was_turned_off else None
+        return (was_turned_off, comment)
     
+    @run_on_worker
     @check_serial
     def is_pid_on(self) -> Tuple[bool, Union[bool, str]]:
         # if not self.ser.is_open:
         #     return (False, "Serial port " + self._port + " is not open. ")
         # else:
-        command = ">pr pid\n"
-        self.ser.write(command.encode('ascii'))
+        cache = self._pid_state_cache
+        if cache is not None and time.monotonic() - cache[0] < self.pid_state_ttl:
+            return (True, cache[1])
+
+        self.ser.write(_CMD_PR_PID)
         was_successful, comment = self.check_ack_succ()
 
         if not was_successful:
             return (was_successful, comment)
 
-        has_on_off, pid_state = super().parse_equal_sign(comment)
-
-        if not has_on_off:
-            return (has_on_off, "Message from device did not contain PID state.")
+        match = _PID_STATE_RE.search(comment)
 
-        if pid_state == "ON":
-            is_on = True
-        else:
-            is_on = False
+        if match is None:
+            return (False, "Message from device did not contain PID state.")
 
+        is_on = match.group(1) == "ON"
+        self._pid_state_cache = (time.monotonic(), is_on)
         return (True, is_on)
 
+    @run_on_worker
     @check_serial
     def temperature(self) -> Tuple[bool, Union[float, str]]:
         # if not self.ser.is_open:
         #     return (False, "Serial port " + self._port + " is not open. ")
         # else:
-        command = ">pr T\n"
-        self.ser.write(command.encode('ascii'))
+        self.ser.write(_CMD_PR_T)
         was_successful, comment = self.check_ack_succ()
 
         if not was_successful:
             return (was_successful, comment)
 
-        has_temperature, temperature_str = super().parse_equal_sign(comment)
+        temperature = _parse_temperature(comment)
 
-        if not has_temperature:
-            return (has_temperature, "Message from device did not contain temperature.")
+        if temperature is None:
+            return (False, "Message from device did not contain temperature.")
         
-        return (True, float(temperature_str))
+        return (True, temperature)
 
+    # The firmware has no combined query, so both queries are sent one after the other inside a single worker job
+    # Each waits for its own ACK/SUCC since nothing confirms the firmware buffers a second command while handling the first,
+    # but the pair costs one queue hop and no other queued call can run between the two readings
+    @run_on_worker
+    @check_serial
+    def get_state(self) -> Tuple[bool, Union[Tuple[float, bool], str]]:
+        self.ser.write(_CMD_PR_T)
+        was_successful, comment = self.check_ack_succ()
 
+        if not was_successful:
+            return (was_successful, comment)
 
-    
+        temperature = _parse_temperature(comment)
+
+        if temperature is None:
+            return (False, "Message from device did not contain temperature.")
+
+        self.ser.write(_CMD_PR_PID)
+        was_successful, comment = self.check_ack_succ()
+
+        if not was_successful:
+            return (was_successful, comment)
+
+        match = _PID_STATE_RE.search(comment)
+
+        if match is None:
+            return (False, "Message from device did not contain PID state.")
+
+        is_on = match.group(1) == "ON"
+        self._pid_state_cache = (time.monotonic(), is_on)
+        return (True, (temperature, is_on))